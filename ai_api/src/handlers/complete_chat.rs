@@ -1,6 +1,5 @@
 use axum::extract::State;
 use axum::{http::StatusCode, response::IntoResponse, Json};
-use openai_dive::v1::api::Client;
 use openai_dive::v1::resources::chat_completion::{ChatCompletionParameters, ChatMessage, Role};
 use serde::{Deserialize, Serialize};
 
@@ -12,7 +11,7 @@ pub async fn handler(
     // as JSON into a list of `ChatMessage` type records
     Json(payload): Json<Vec<SimpleChatMessage>>,
 ) -> impl IntoResponse {
-    let client = Client::new(state.openai_key());
+    let client = state.openai_client();
 
     let parameters = ChatCompletionParameters {
         model: "gpt-4".to_string(),
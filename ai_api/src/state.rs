@@ -1,14 +1,19 @@
+use openai_dive::v1::api::Client;
+use std::sync::Arc;
+
 #[derive(Clone)]
 pub struct AppState {
-    openai_key: String,
+    openai_client: Arc<Client>,
 }
 
 impl AppState {
     pub fn new(openai_key: String) -> Self {
-        Self { openai_key }
+        Self {
+            openai_client: Arc::new(Client::new(openai_key)),
+        }
     }
 
-    pub fn openai_key(&self) -> String {
-        self.openai_key.to_string()
+    pub fn openai_client(&self) -> &Client {
+        &self.openai_client
     }
 }
@@ -24,12 +24,14 @@ pub async fn create_pool() -> Pool {
 
     let database_url = env::var("DATABASE_URL").expect("DATABASE_URL must be set");
     let config = AsyncDieselConnectionManager::<diesel_async::AsyncPgConnection>::new(database_url);
+    // keep a couple of connections open so requests after an idle period don't wait on a new
+    // connection. build_unchecked opens them in the background, so startup doesn't depend on
+    // the database already accepting connections.
     Pool::builder()
         .test_on_check_out(true)
         .max_size(10)
-        .build(config)
-        .await
-        .unwrap()
+        .min_idle(Some(2))
+        .build_unchecked(config)
 }
 
 pub struct ConnectionWrapper<'a> {
@@ -1,8 +1,7 @@
-use axum::http::header::{HeaderName, AUTHORIZATION};
+use axum::http::header::{HeaderName, AUTHORIZATION, CONTENT_TYPE};
 use axum::http::HeaderValue;
 use axum::response::IntoResponse;
 use axum::{routing::get, Router};
-use serde_json::json;
 use std::iter::once;
 use std::net::SocketAddr;
 use tower_http::cors::CorsLayer;
@@ -86,11 +85,17 @@ where
         )))
 }
 
+const HEALTH_BODY: &str = r#"{"status":"UP"}"#;
+
 #[instrument]
 async fn health() -> impl IntoResponse {
     tracing::info!("health check");
 
-    axum::Json(json!({ "status" : "UP" }))
+    // the body never changes, so skip building and serializing a json value on every check
+    (
+        [(CONTENT_TYPE, HeaderValue::from_static("application/json"))],
+        HEALTH_BODY,
+    )
 }
 
 async fn shutdown_signal() {
@@ -121,14 +126,15 @@ async fn shutdown_signal() {
 
 #[cfg(test)]
 mod tests {
-    use tokio::runtime::Runtime;
-
     use super::*;
 
-    #[test]
-    fn test_health() {
-        let rt = Runtime::new().unwrap();
-        let response = rt.block_on(health()).into_response();
+    #[tokio::test]
+    async fn test_health() {
+        let response = health().await.into_response();
         assert_eq!(response.status(), 200);
+        assert_eq!(response.headers()[CONTENT_TYPE], "application/json");
+
+        let body = hyper::body::to_bytes(response.into_body()).await.unwrap();
+        assert_eq!(&body[..], br#"{"status":"UP"}"#);
     }
 }
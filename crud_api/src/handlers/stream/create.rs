@@ -2,7 +2,6 @@ use axum::extract::Json;
 use axum::response::IntoResponse;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 
@@ -40,5 +39,5 @@ pub async fn handler(
 
     // TODO: add topic_ids
 
-    axum::Json(json!(StreamDetailView::from((record, vec![])))).into_response()
+    axum::Json(StreamDetailView::from((record, vec![]))).into_response()
 }
@@ -4,7 +4,6 @@ use axum::response::IntoResponse;
 use diesel::expression::expression_types::NotSelectable;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 
@@ -89,7 +88,7 @@ pub async fn handler(
             (header::CONTENT_RANGE, pagination_info),
             (header::CONTENT_TYPE, "application/json".to_string()),
         ],
-        axum::Json(json!(prepared_results)),
+        axum::Json(prepared_results),
     )
         .into_response()
 }
@@ -3,7 +3,6 @@ use axum::http::{header, StatusCode};
 use axum::response::IntoResponse;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 use uuid::Uuid;
@@ -23,36 +22,36 @@ pub async fn handler(
 
     tracing::info!("get_stream");
 
-    let result: Result<Stream, _> = streams
+    // load the stream together with its video clips in a single query
+    let result: Result<Vec<(Stream, Option<VideoClip>)>, _> = streams
+        .left_join(schema::video_clips::table)
         .filter(id.eq(record_id))
-        .select(streams::all_columns())
-        .first(&mut db.connection)
+        .select((
+            streams::all_columns(),
+            schema::video_clips::all_columns.nullable(),
+        ))
+        .load(&mut db.connection)
         .await;
 
-    let video_clips_result: Result<Vec<VideoClip>, _> =
-        crate::schema::video_clips::dsl::video_clips
-            .filter(crate::schema::video_clips::dsl::stream_id.eq(record_id))
-            .select(crate::schema::video_clips::dsl::video_clips::all_columns())
-            .load(&mut db.connection)
-            .await;
-
-    let video_clips = match video_clips_result {
-        Ok(video_clips) => video_clips,
-        Err(_) => vec![],
+    let mut rows = match result {
+        Ok(rows) => rows.into_iter(),
+        Err(_) => return (StatusCode::NOT_FOUND).into_response(),
     };
 
-    match result {
-        Ok(result) => {
-            let result = StreamDetailView::from((result, video_clips));
+    // every row carries the same stream, so take it from the first one
+    let (stream, first_video_clip) = match rows.next() {
+        Some(row) => row,
+        None => return (StatusCode::NOT_FOUND).into_response(),
+    };
 
-            let stream_view = StreamDetailView::from(result);
+    let video_clips = first_video_clip
+        .into_iter()
+        .chain(rows.filter_map(|(_, video_clip)| video_clip))
+        .collect::<Vec<VideoClip>>();
 
-            (
-                [(header::CONTENT_TYPE, "application/json")],
-                axum::Json(json!(stream_view)),
-            )
-                .into_response()
-        }
-        Err(_) => (StatusCode::NOT_FOUND).into_response(),
-    }
+    (
+        [(header::CONTENT_TYPE, "application/json")],
+        axum::Json(StreamDetailView::from((stream, video_clips))),
+    )
+        .into_response()
 }
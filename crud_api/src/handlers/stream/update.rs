@@ -2,8 +2,8 @@ use axum::extract::Path;
 use axum::response::IntoResponse;
 use axum::Json;
 use diesel::prelude::*;
-use diesel_async::RunQueryDsl;
-use serde_json::json;
+use diesel_async::scoped_futures::ScopedFutureExt;
+use diesel_async::{AsyncConnection, RunQueryDsl};
 use tracing;
 use tracing::instrument;
 use uuid::Uuid;
@@ -141,37 +141,39 @@ pub async fn handler(
 
     tracing::info!("update_stream");
 
-    // insert body.video_clips into video_clips table, updating existing records and deleting missing records
-    if let Some(video_clips) = body.video_clips {
-        for video_clip in video_clips {
-            match diesel::insert_into(crate::schema::video_clips::table)
-                .values(VideoClipInsertable::from((video_clip.clone(), record_id)))
-                .on_conflict(crate::schema::video_clips::dsl::id)
-                .do_update()
-                .set(VideoClipChangeset::from(video_clip))
-                .get_result::<VideoClip>(&mut db.connection)
-                .await
-            {
-                Ok(record) => record,
-                Err(e) => {
-                    tracing::error!("Error inserting record: {}", e);
-                    return (axum::http::StatusCode::INTERNAL_SERVER_ERROR).into_response();
-                }
-            };
-        }
-    };
-
-    let result: Result<Stream, diesel::result::Error> =
-        diesel::update(streams.filter(id.eq(record_id)))
-            .set(&UpdateStreamChangeset {
-                title: body.title,
-                description: body.description,
-                thumbnail_url: body.thumbnail,
-                prefix: body.prefix,
-                speech_audio_url: body.speech_audio_track,
-            })
-            .get_result(&mut db.connection)
-            .await;
+    // apply the clip upserts and the stream update in a single transaction, so they are
+    // committed together instead of one commit per statement
+    let result: Result<Stream, diesel::result::Error> = db
+        .connection
+        .transaction(|conn| {
+            async move {
+                // insert body.video_clips into video_clips table, updating existing records and deleting missing records
+                if let Some(video_clips) = body.video_clips {
+                    for video_clip in video_clips {
+                        diesel::insert_into(crate::schema::video_clips::table)
+                            .values(VideoClipInsertable::from((video_clip.clone(), record_id)))
+                            .on_conflict(crate::schema::video_clips::dsl::id)
+                            .do_update()
+                            .set(VideoClipChangeset::from(video_clip))
+                            .execute(conn)
+                            .await?;
+                    }
+                };
+
+                diesel::update(streams.filter(id.eq(record_id)))
+                    .set(&UpdateStreamChangeset {
+                        title: body.title,
+                        description: body.description,
+                        thumbnail_url: body.thumbnail,
+                        prefix: body.prefix,
+                        speech_audio_url: body.speech_audio_track,
+                    })
+                    .get_result(conn)
+                    .await
+            }
+            .scope_boxed()
+        })
+        .await;
 
     let video_clips_result: Result<Vec<VideoClip>, _> =
         crate::schema::video_clips::dsl::video_clips
@@ -188,7 +190,7 @@ pub async fn handler(
     match result {
         Ok(result) => (
             [(axum::http::header::CONTENT_TYPE, "application/json")],
-            axum::Json(json!(StreamDetailView::from((result, video_clips)))),
+            axum::Json(StreamDetailView::from((result, video_clips))),
         )
             .into_response(),
 
@@ -2,7 +2,6 @@ use axum::extract::Json;
 use axum::response::IntoResponse;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 
@@ -45,5 +44,5 @@ pub async fn handler(
         }
     };
 
-    axum::Json(json!(VideoClipDetailView::from(record))).into_response()
+    axum::Json(VideoClipDetailView::from(record)).into_response()
 }
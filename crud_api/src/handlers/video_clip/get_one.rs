@@ -3,7 +3,6 @@ use axum::http::{header, StatusCode};
 use axum::response::IntoResponse;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 use uuid::Uuid;
@@ -35,7 +34,7 @@ pub async fn handler(
 
             (
                 [(header::CONTENT_TYPE, "application/json")],
-                axum::Json(json!(video_clip_view)),
+                axum::Json(video_clip_view),
             )
                 .into_response()
         }
@@ -4,7 +4,6 @@ use axum::Json;
 use diesel::data_types::PgInterval;
 use diesel::prelude::*;
 use diesel_async::RunQueryDsl;
-use serde_json::json;
 use tracing;
 use tracing::instrument;
 use uuid::Uuid;
@@ -69,7 +68,7 @@ pub async fn handler(
     match result {
         Ok(result) => (
             [(axum::http::header::CONTENT_TYPE, "application/json")],
-            axum::Json(json!(VideoClipDetailView::from(result))),
+            axum::Json(VideoClipDetailView::from(result)),
         )
             .into_response(),
 
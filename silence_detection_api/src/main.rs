@@ -9,32 +9,50 @@ use common_api_lib;
 use dotenvy;
 use regex::Regex;
 use serde::{Deserialize, Serialize};
-use serde_json::json;
+use std::borrow::Cow;
+use std::process::Stdio;
+use std::sync::Arc;
+use tokio::io::{AsyncBufReadExt, BufReader};
 use tokio::process::Command;
 use tracing::instrument;
 
+/// Matches the end of a silence in ffmpeg's silencedetect output.
+const SILENCE_END_PATTERN: &str =
+    r"silence_end: (?<end>\d+(\.\d+)?) \| silence_duration: (?<duration>\d+(\.\d+)?)";
+
 #[derive(Clone, Debug)]
 struct AppState {
     video_storage_path: String,
     noise: f64,
     duration: f64,
+    // shared rather than owned, since axum clones the state for every request
+    default_filter: Arc<str>,
+
+    silence_end_regex: Regex,
 }
 
 #[tokio::main]
 async fn main() -> Result<(), axum::BoxError> {
+    let noise = dotenvy::var("NOISE")
+        .expect("NOISE must be set")
+        .parse::<f64>()
+        .expect("NOISE must be a float");
+
+    let duration = dotenvy::var("DURATION")
+        .expect("DURATION must be set")
+        .parse::<f64>()
+        .expect("DURATION must be a float");
+
     let state = AppState {
         video_storage_path: dotenvy::var("VIDEO_STORAGE_PATH")
             .expect("VIDEO_STORAGE_PATH must be set"),
 
-        noise: dotenvy::var("NOISE")
-            .expect("NOISE must be set")
-            .parse::<f64>()
-            .expect("NOISE must be a float"),
+        noise,
+        duration,
+        default_filter: silence_filter(noise, duration).into(),
 
-        duration: dotenvy::var("DURATION")
-            .expect("DURATION must be set")
-            .parse::<f64>()
-            .expect("DURATION must be a float"),
+        silence_end_regex: Regex::new(SILENCE_END_PATTERN)
+            .expect("silence_end regex must be valid"),
     };
 
     common_api_lib::run(state, |app| {
@@ -80,8 +98,14 @@ async fn detect_segment(
     State(state): State<AppState>,
     Json(body): Json<DetectSegmentInput>,
 ) -> impl IntoResponse {
-    let noise = body.noise.unwrap_or(state.noise);
-    let duration = body.duration.unwrap_or(state.duration);
+    // only build a new filter when the request overrides the configured defaults
+    let filter = match (body.noise, body.duration) {
+        (None, None) => Cow::Borrowed(&*state.default_filter),
+        (noise, duration) => Cow::Owned(silence_filter(
+            noise.unwrap_or(state.noise),
+            duration.unwrap_or(state.duration),
+        )),
+    };
 
     // if no uris are provided, return an empty list of segments
     if body.uris.is_empty() {
@@ -90,7 +114,7 @@ async fn detect_segment(
             segments: Vec::new(),
         };
 
-        return (StatusCode::OK, axum::Json(json!(output))).into_response();
+        return (StatusCode::OK, axum::Json(output)).into_response();
     }
 
     let track = body.track;
@@ -101,12 +125,14 @@ async fn detect_segment(
         None => Cursor { index: 0 },
     };
 
+    let uri_count = body.uris.len();
+
     // if cursor is out of bounds, return an error
-    if cursor.index >= body.uris.len() {
+    if cursor.index >= uri_count {
         return (StatusCode::BAD_REQUEST, "invalid cursor").into_response();
     }
 
-    let uri = body.uris[cursor.index].clone();
+    let uri = &body.uris[cursor.index];
     // extract filename from uri
     let filename = match uri.split('/').last() {
         Some(filename) => filename,
@@ -115,83 +141,115 @@ async fn detect_segment(
 
     let path = format!("{}/{}", state.video_storage_path, filename);
 
-    let command_output = match Command::new("ffmpeg")
+    let mut ffmpeg = match Command::new("ffmpeg")
         .arg("-hide_banner")
+        // progress lines are most of ffmpeg's stderr and we never look at them
+        .arg("-nostats")
         .arg("-i")
         .arg(path)
         .arg("-map")
         .arg(format!("0:a:{}", track))
         .arg("-af")
-        .arg(format!(
-            "silencedetect=noise={}:duration={}",
-            noise, duration
-        ))
+        .arg(&*filter)
         .arg("-f")
         .arg("null")
         .arg("-")
-        .output()
-        .await
+        // match what .output() did: no stdin for ffmpeg's interactive keys, and no stdout
+        .stdin(Stdio::null())
+        .stdout(Stdio::null())
+        .stderr(Stdio::piped())
+        .spawn()
     {
-        Ok(output) => output,
+        Ok(process) => process,
         Err(_) => return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response(),
     };
 
-    let command_stderr = String::from_utf8_lossy(&command_output.stderr);
-
-    // handle output status code
-    if !command_output.status.success() {
-        tracing::error!("ffmpeg error: {}", command_stderr);
-        return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response();
-    }
-
-    // trace output
-    tracing::trace!("ffmpeg output: {}", command_stderr);
-
-    // detect error in filter by looking for "Conversion failed!" in output
-    if command_stderr.contains("Conversion failed!") {
-        return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response();
-    }
-
-    let re = match Regex::new(
-        r"silence_end: (?<end>\d+(\.\d+)?) \| silence_duration: (?<duration>\d+(\.\d+)?)",
-    ) {
-        Ok(re) => re,
-        Err(_) => return (StatusCode::INTERNAL_SERVER_ERROR, "regex error").into_response(),
+    let stderr = match ffmpeg.stderr.take() {
+        Some(stderr) => stderr,
+        None => return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response(),
     };
 
+    // parse ffmpeg's stderr line by line as it runs instead of buffering all of it
+    let mut reader = BufReader::new(stderr);
+    let mut line = Vec::new();
+    let mut last_line = String::new();
+    let mut conversion_failed = false;
     let mut segments = Vec::new();
 
-    for cap in re.captures_iter(&command_stderr) {
-        let end = cap["end"].parse::<f64>().unwrap();
-        let duration = cap["duration"].parse::<f64>().unwrap();
+    loop {
+        line.clear();
+
+        match reader.read_until(b'\n', &mut line).await {
+            Ok(0) => break,
+            Ok(_) => {}
+            Err(e) => {
+                tracing::error!("failed to read ffmpeg output: {}", e);
+                let _ = ffmpeg.kill().await;
+                return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response();
+            }
+        }
+
+        let text = String::from_utf8_lossy(&line);
+
+        // trace output
+        tracing::trace!("ffmpeg output: {}", text.trim_end());
+
+        // detect error in filter by looking for "Conversion failed!" in output
+        if text.contains("Conversion failed!") {
+            conversion_failed = true;
+        }
+
+        segments.extend(
+            state
+                .silence_end_regex
+                .captures_iter(&text)
+                .filter_map(parse_silence_end),
+        );
+
+        last_line.clear();
+        last_line.push_str(text.trim_end());
+    }
 
-        let start = end - duration;
+    let status = match ffmpeg.wait().await {
+        Ok(status) => status,
+        Err(_) => return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response(),
+    };
 
-        segments.push(Segment {
-            start: std::time::Duration::from_secs_f64(start),
-            end: std::time::Duration::from_secs_f64(end),
-        });
+    // handle output status code
+    if !status.success() {
+        tracing::error!("ffmpeg error: {}: {}", status, last_line);
+        return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response();
     }
 
-    // handle case where we are at the end of the list
-    let length = body.uris.len();
-    if cursor.index + 1 >= length {
-        let output = DetectSegmentOutput {
-            cursor: None,
-            segments,
-        };
-
-        return (StatusCode::OK, axum::Json(json!(output))).into_response();
+    if conversion_failed {
+        return (StatusCode::INTERNAL_SERVER_ERROR, "ffmpeg error").into_response();
     }
 
+    // if this was the last item in the list, then there is no next cursor
+    let next_index = cursor.index + 1;
     let output = DetectSegmentOutput {
-        cursor: Some(Cursor {
-            index: cursor.index + 1,
-        }),
+        cursor: (next_index < uri_count).then(|| Cursor { index: next_index }),
         segments,
     };
 
-    (StatusCode::OK, axum::Json(json!(output))).into_response()
+    (StatusCode::OK, axum::Json(output)).into_response()
+}
+
+fn silence_filter(noise: f64, duration: f64) -> String {
+    format!("silencedetect=noise={}:duration={}", noise, duration)
+}
+
+fn parse_silence_end(cap: regex::Captures) -> Option<Segment> {
+    let end = cap["end"].parse::<f64>().ok()?;
+    let duration = cap["duration"].parse::<f64>().ok()?;
+
+    // rounding in ffmpeg's output can put the start a hair before zero
+    let start = (end - duration).max(0.0);
+
+    Some(Segment {
+        start: std::time::Duration::from_secs_f64(start),
+        end: std::time::Duration::from_secs_f64(end),
+    })
 }
 
 #[derive(Deserialize, Debug)]
@@ -206,3 +264,21 @@ async fn detect(Json(_body): Json<DetectInput>) -> impl IntoResponse {
 
     (StatusCode::ACCEPTED, [(header::LOCATION, "test")]).into_response()
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_parse_silence_end_clamps_start() {
+        let regex = Regex::new(SILENCE_END_PATTERN).unwrap();
+        let captures = regex
+            .captures("silence_end: 1.0 | silence_duration: 1.0000001")
+            .unwrap();
+
+        let segment = parse_silence_end(captures).unwrap();
+
+        assert_eq!(segment.start, std::time::Duration::ZERO);
+        assert_eq!(segment.end, std::time::Duration::from_secs(1));
+    }
+}
@@ -408,9 +408,14 @@ pub async fn probe(path: &str) -> Result<FFProbeOutput, Box<dyn std::error::Erro
         Err(_) => return Err("Failed to execute ffprobe".into()),
     };
 
-    let output = String::from_utf8_lossy(&output.stdout);
+    // a failed probe prints nothing useful (output is quiet), so don't try to parse it
+    if !output.status.success() {
+        tracing::error!("ffprobe failed for {}: {}", path, output.status);
+        return Err("ffprobe failed".into());
+    }
 
-    match serde_json::from_str(&output) {
+    // parse the bytes directly rather than copying them into a String first
+    match serde_json::from_slice(&output.stdout) {
         Ok(output) => Ok(output),
         Err(err) => {
             tracing::error!("Failed to parse ffprobe output: {}", err);
@@ -6,10 +6,15 @@ use axum::{
 use common_api_lib;
 use dotenvy;
 use serde::{Deserialize, Serialize};
-use serde_json::json;
+use std::sync::Arc;
+use tokio::sync::Semaphore;
+use tokio::task::JoinSet;
 
 mod ffprobe;
 
+/// Upper bound on the number of ffprobe processes run at once by find_files.
+const MAX_CONCURRENT_PROBES: usize = 8;
+
 #[derive(Clone)]
 struct AppState {
     video_storage_path: String,
@@ -96,94 +101,30 @@ async fn find_files(
 
     tracing::debug!("find_files: files: {:?}", files);
 
-    let mut entries = Vec::new();
+    // probe the files concurrently, since each probe is a separate ffprobe process
+    let semaphore = Arc::new(Semaphore::new(MAX_CONCURRENT_PROBES));
+    let mut probes = JoinSet::new();
+    let file_count = files.len();
 
     for file in files {
-        tracing::debug!("find_files: file: {:?}", file);
-
-        let path = format!("{}/{}", &state.video_storage_path, file);
+        let video_storage_path = state.video_storage_path.clone();
+        let semaphore = semaphore.clone();
 
-        let metadata = match tokio::fs::metadata(&path).await {
-            Ok(metadata) => metadata,
-            Err(_) => continue,
-        };
-
-        tracing::debug!("find_files: metadata: {:?}", metadata);
-
-        let (width, height, duration, frame_rate, video_bitrate, audio_bitrate, audio_track_count) =
-            match ffprobe::probe(&path).await {
-                Ok(probe) => {
-                    let video_stream = probe
-                        .streams
-                        .iter()
-                        .find(|stream| stream.codec_type == "video");
-
-                    let audio_stream = probe
-                        .streams
-                        .iter()
-                        .find(|stream| stream.codec_type == "audio");
-
-                    let video_stream = match video_stream {
-                        Some(video_stream) => video_stream,
-                        None => continue,
-                    };
-
-                    let audio_stream = match audio_stream {
-                        Some(audio_stream) => audio_stream,
-                        None => continue,
-                    };
-
-                    let audio_stream_count = probe
-                        .streams
-                        .iter()
-                        .filter(|stream| stream.codec_type == "audio")
-                        .count();
-
-                    (
-                        video_stream.width,
-                        video_stream.height,
-                        probe.format.duration,
-                        video_stream.avg_frame_rate.clone(),
-                        probe.format.bit_rate,
-                        audio_stream.sample_rate,
-                        Some(audio_stream_count as u32),
-                    )
-                }
-                Err(_) => (None, None, None, None, None, None, None),
-            };
-
-        let metadata = Metadata {
-            filename: format!("{}", file),
-            content_type: "video/mp4".to_string(),
-            size: metadata.len(),
-            last_modified: match metadata.modified() {
-                Ok(last_modified) => last_modified.into(),
-                Err(_) => continue,
-            },
-            start_time: chrono::Duration::zero(),
-            duration: chrono::Duration::milliseconds(
-                duration.map_or(0, |duration| (duration * 1000.0) as i64),
-            ),
-            width,
-            height,
-            frame_rate: frame_rate.map(|frame_rate| {
-                let mut parts = frame_rate.split('/');
-
-                let numerator = parts.next().unwrap().parse::<f32>().unwrap();
-                let denominator = parts.next().unwrap().parse::<f32>().unwrap();
-
-                numerator / denominator
-            }),
-            video_bitrate,
-            audio_bitrate,
-            audio_track_count,
-        };
+        probes.spawn(async move {
+            let _permit = semaphore.acquire_owned().await.ok()?;
 
-        let uri = format!("file:local:{}", file);
+            probe_entry(&video_storage_path, file).await
+        });
+    }
 
-        tracing::debug!("find_files: uri: {:?}", uri);
+    let mut entries = Vec::with_capacity(file_count);
 
-        entries.push(Entry { metadata, uri });
+    while let Some(result) = probes.join_next().await {
+        match result {
+            Ok(Some(entry)) => entries.push(entry),
+            Ok(None) => {}
+            Err(e) => tracing::error!("find_files: probe task failed: {}", e),
+        }
     }
 
     // sort by filename, ascending
@@ -197,5 +138,93 @@ async fn find_files(
         cumulative_duration = cumulative_duration + entry.metadata.duration;
     }
 
-    axum::Json(json!(FindFilesResponse { entries: entries })).into_response()
+    axum::Json(FindFilesResponse { entries }).into_response()
+}
+
+async fn probe_entry(video_storage_path: &str, file: String) -> Option<Entry> {
+    tracing::debug!("find_files: file: {:?}", file);
+
+    let path = format!("{}/{}", video_storage_path, file);
+
+    let metadata = match tokio::fs::metadata(&path).await {
+        Ok(metadata) => metadata,
+        Err(_) => return None,
+    };
+
+    tracing::debug!("find_files: metadata: {:?}", metadata);
+
+    let (width, height, duration, frame_rate, video_bitrate, audio_bitrate, audio_track_count) =
+        match ffprobe::probe(&path).await {
+            Ok(probe) => {
+                let video_stream = probe
+                    .streams
+                    .iter()
+                    .find(|stream| stream.codec_type == "video");
+
+                let audio_stream = probe
+                    .streams
+                    .iter()
+                    .find(|stream| stream.codec_type == "audio");
+
+                let video_stream = match video_stream {
+                    Some(video_stream) => video_stream,
+                    None => return None,
+                };
+
+                let audio_stream = match audio_stream {
+                    Some(audio_stream) => audio_stream,
+                    None => return None,
+                };
+
+                let audio_stream_count = probe
+                    .streams
+                    .iter()
+                    .filter(|stream| stream.codec_type == "audio")
+                    .count();
+
+                (
+                    video_stream.width,
+                    video_stream.height,
+                    probe.format.duration,
+                    video_stream.avg_frame_rate.clone(),
+                    probe.format.bit_rate,
+                    audio_stream.sample_rate,
+                    Some(audio_stream_count as u32),
+                )
+            }
+            Err(_) => (None, None, None, None, None, None, None),
+        };
+
+    let metadata = Metadata {
+        filename: format!("{}", file),
+        content_type: "video/mp4".to_string(),
+        size: metadata.len(),
+        last_modified: match metadata.modified() {
+            Ok(last_modified) => last_modified.into(),
+            Err(_) => return None,
+        },
+        start_time: chrono::Duration::zero(),
+        duration: chrono::Duration::milliseconds(
+            duration.map_or(0, |duration| (duration * 1000.0) as i64),
+        ),
+        width,
+        height,
+        frame_rate: frame_rate.map(|frame_rate| {
+            let mut parts = frame_rate.split('/');
+
+            let numerator = parts.next().unwrap().parse::<f32>().unwrap();
+            let denominator = parts.next().unwrap().parse::<f32>().unwrap();
+
+            numerator / denominator
+        }),
+        video_bitrate,
+        audio_bitrate,
+        audio_track_count,
+    };
+
+    let uri = format!("file:local:{}", file);
+
+    tracing::debug!("find_files: uri: {:?}", uri);
+
+    Some(Entry { metadata, uri })
 }
@@ -3,20 +3,35 @@ use axum::Json;
 use axum::{http::StatusCode, response::IntoResponse, routing::get};
 use common_api_lib;
 use dotenvy;
-use redis::{Commands, ConnectionLike};
+use redis::AsyncCommands;
 use serde::{Deserialize, Serialize};
 use serde_json::json;
 use tracing::instrument;
 
-#[derive(Clone, Debug)]
+#[derive(Clone)]
 struct AppState {
-    redis: redis::Client,
+    redis: redis::aio::ConnectionManager,
+    queue_name: String,
+}
+
+impl std::fmt::Debug for AppState {
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
+        f.debug_struct("AppState")
+            .field("redis", &"ConnectionManager")
+            .field("queue_name", &self.queue_name)
+            .finish()
+    }
 }
 
 #[tokio::main]
 async fn main() -> Result<(), axum::BoxError> {
+    let redis_client =
+        redis::Client::open(dotenvy::var("REDIS_URL").expect("REDIS_URL must be set"))?;
+
     let state = AppState {
-        redis: redis::Client::open(dotenvy::var("REDIS_URL").expect("REDIS_URL must be set"))?,
+        // one multiplexed, auto-reconnecting connection shared by every request
+        redis: redis::aio::ConnectionManager::new(redis_client).await?,
+        queue_name: dotenvy::var("QUEUE_NAME").expect("QUEUE_NAME must be set"),
     };
 
     common_api_lib::run(state, |app| {
@@ -33,27 +48,31 @@ async fn main() -> Result<(), axum::BoxError> {
 
 #[instrument]
 async fn get_list_handler(State(state): State<AppState>) -> impl IntoResponse {
-    let mut con = match state.redis.get_connection() {
-        Ok(con) => con,
-        Err(e) => {
-            tracing::error!("Failed to get redis connection: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
+    let mut con = state.redis.clone();
 
     // get the list of records from redis using the key pattern with scan_match
-    let keys: Vec<String> = match con.scan_match("task:[0-9]*") {
-        Ok(keys) => keys.collect(),
+    let mut keys_iter = match con.scan_match::<_, String>("task:[0-9]*").await {
+        Ok(keys_iter) => keys_iter,
         Err(e) => {
             tracing::error!("Failed to get task keys: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
+            return internal_error();
         }
     };
 
+    let mut keys: Vec<String> = Vec::new();
+
+    while let Some(key) = keys_iter.next_item().await {
+        // the pattern also matches each task's data list (task:<id>:data), so only keep the
+        // task records themselves
+        if is_task_key(&key) {
+            keys.push(key);
+        }
+    }
+
     // TODO get the records from redis
 
     // return the list of records
-    (StatusCode::OK, axum::Json(json!(keys))).into_response()
+    (StatusCode::OK, axum::Json(keys)).into_response()
 }
 
 #[derive(Deserialize, Debug)]
@@ -63,86 +82,74 @@ struct CreateTaskInput {
     data_key: String,
 }
 
+#[derive(Serialize, Debug)]
+struct CreateTaskOutput {
+    id: String,
+    url: String,
+    payload: serde_json::Value,
+}
+
 #[instrument]
 async fn create_handler(
     State(state): State<AppState>,
     Json(body): Json<CreateTaskInput>,
 ) -> impl IntoResponse {
-    // TODO move this to an axum extractor???
-    let mut con = match state.redis.get_connection() {
-        Ok(con) => con,
-        Err(e) => {
-            tracing::error!("Failed to get redis connection: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
-
-    let queue_name = match dotenvy::var("QUEUE_NAME") {
-        Ok(queue_name) => queue_name,
-        Err(e) => {
-            tracing::error!("Failed to get QUEUE_NAME: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
+    let mut con = state.redis.clone();
 
     // generate a unique id for the task by incrementing the task counter
-    let id: u64 = match con.incr("task:counter", 1) {
+    let id: u64 = match con.incr("task:counter", 1).await {
         Ok(id) => {
             tracing::info!("Generated task id: {}", id);
             id
         }
         Err(e) => {
             tracing::error!("Failed to generate task id: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
+            return internal_error();
         }
     };
 
     // key pattern = task:(next-id)
     let key = generate_task_key(id);
 
-    // create task record as a hash in redis with a unique id
-    match con.req_command(
-        redis::cmd("HMSET")
-            .arg(&key)
-            .arg("id")
-            .arg(id)
-            .arg("status")
-            .arg("queued")
-            .arg("url")
-            .arg(&body.url)
-            .arg("payload")
-            .arg(body.payload.to_string())
-            .arg("data_key")
-            .arg(&body.data_key),
-    ) {
+    // create task record as a hash in redis with a unique id and add the task key to the
+    // queue, in one atomic round trip so a worker never sees a key without its record
+    match redis::pipe()
+        .atomic()
+        .cmd("HSET")
+        .arg(&key)
+        .arg("id")
+        .arg(id)
+        .arg("status")
+        .arg("queued")
+        .arg("url")
+        .arg(&body.url)
+        .arg("payload")
+        .arg(body.payload.to_string())
+        .arg("data_key")
+        .arg(&body.data_key)
+        .ignore()
+        .lpush(&state.queue_name, &key)
+        .ignore()
+        .query_async::<_, ()>(&mut con)
+        .await
+    {
         Ok(_) => {
-            tracing::info!("Created task record: {}", key);
+            tracing::info!("Created task record {} on queue {}", key, state.queue_name);
         }
         Err(e) => {
             tracing::error!("Failed to create task record: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
-
-    // add the task key to the queue
-    match con.lpush::<&std::string::String, &std::string::String, ()>(&queue_name, &key) {
-        Ok(_) => {
-            tracing::info!("Added task to queue: {}", queue_name);
-        }
-        Err(e) => {
-            tracing::error!("Failed to add task to queue: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
+            return internal_error();
         }
     };
 
     // return the created task record
     (
         StatusCode::OK,
-        axum::Json(json!({
-            "id": id.to_string(),
-            "url": body.url,
-            "payload": body.payload,
-        })),
+        axum::Json(CreateTaskOutput {
+            id: id.to_string(),
+            url: body.url,
+            payload: body.payload,
+        }),
     )
         .into_response()
 }
@@ -167,22 +174,24 @@ async fn get_one_handler(
     Path(record_id): Path<u64>,
     State(state): State<AppState>,
 ) -> impl IntoResponse {
-    let mut con = match state.redis.get_connection() {
-        Ok(con) => con,
-        Err(e) => {
-            tracing::error!("Failed to get redis connection: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
+    let mut con = state.redis.clone();
 
     // get the record from redis
     let key = generate_task_key(record_id);
 
-    let status: String = match con.hget(&key, "status") {
-        Ok(status) => status,
+    // get the status and the data list (if it exists) together in one round trip
+    let data_key = generate_task_data_key(record_id);
+
+    let (status, data): (String, Vec<String>) = match redis::pipe()
+        .hget(&key, "status")
+        .lrange(&data_key, 0, -1)
+        .query_async(&mut con)
+        .await
+    {
+        Ok(result) => result,
         Err(e) => {
             tracing::error!("Failed to get task record: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
+            return internal_error();
         }
     };
 
@@ -193,18 +202,7 @@ async fn get_one_handler(
         "failed" => TaskStatus::Failed,
         _ => {
             tracing::error!("Invalid task status: {}", status);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
-        }
-    };
-
-    // get the data list from redis if it exists
-    let data_key = generate_task_data_key(record_id);
-
-    let data: Vec<String> = match con.lrange(&data_key, 0, -1) {
-        Ok(data) => data,
-        Err(e) => {
-            tracing::error!("Failed to get data list: {}", e);
-            return (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response();
+            return internal_error();
         }
     };
 
@@ -224,7 +222,7 @@ async fn get_one_handler(
         data,
     };
 
-    (StatusCode::OK, axum::Json(json!(record))).into_response()
+    (StatusCode::OK, axum::Json(record)).into_response()
 }
 
 #[instrument]
@@ -243,6 +241,19 @@ async fn delete_handler() -> impl IntoResponse {
     (StatusCode::OK, axum::Json(json!({}))).into_response()
 }
 
+/**
+ * Builds the 500 response for internal failures. The cause is logged by the caller, so the
+ * body is empty.
+ */
+fn internal_error() -> axum::response::Response {
+    (StatusCode::INTERNAL_SERVER_ERROR, axum::Json(json!({}))).into_response()
+}
+
+fn is_task_key(key: &str) -> bool {
+    key.strip_prefix("task:")
+        .is_some_and(|id| !id.is_empty() && id.bytes().all(|b| b.is_ascii_digit()))
+}
+
 fn generate_task_key(id: u64) -> String {
     format!("task:{}", id)
 }
@@ -250,3 +261,18 @@ fn generate_task_key(id: u64) -> String {
 fn generate_task_data_key(id: u64) -> String {
     format!("task:{}:data", id)
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_is_task_key() {
+        assert!(is_task_key("task:12"));
+
+        assert!(!is_task_key("task:12:data"));
+        assert!(!is_task_key("task:"));
+        assert!(!is_task_key("task:counter"));
+        assert!(!is_task_key("task:1a"));
+    }
+}
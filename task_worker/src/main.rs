@@ -1,12 +1,25 @@
 use std::collections::HashMap;
 
 use redis::Commands;
+use serde_json::value::RawValue;
+use tracing_subscriber::prelude::*;
 
 #[tokio::main]
 async fn main() {
-    println!("Starting task worker");
+    tracing_subscriber::registry()
+        .with(tracing_subscriber::fmt::layer())
+        .with(tracing_subscriber::EnvFilter::from_default_env())
+        .init();
 
-    let client = reqwest::Client::new();
+    tracing::info!("Starting task worker");
+
+    // the worker calls the same few services for every page of every task, so keep idle
+    // pooled connections to them around longer than reqwest's 90s default, letting the next
+    // task after a quiet spell reuse them instead of reconnecting
+    let client = reqwest::Client::builder()
+        .pool_idle_timeout(std::time::Duration::from_secs(300))
+        .build()
+        .expect("Failed to build http client");
 
     let mut con = redis::Client::open(dotenvy::var("REDIS_URL").expect("REDIS_URL must be set"))
         .expect("Failed to open redis client")
@@ -28,88 +41,127 @@ async fn main() {
             )
             .expect("Failed to get task from queue");
 
-        println!("Got task key: {}", task_key);
+        tracing::info!("Got task key: {}", task_key);
 
         // get the task data
         let task_data: HashMap<String, String> = con
             .hgetall(&task_key)
             .expect("Failed to get task data from redis");
 
-        println!("Got task data: {:?}", task_data);
+        tracing::debug!("Got task data: {:?}", task_data);
 
         // update the status to processing
         let _: () = con
             .hset(&task_key, "status", "processing")
             .expect("Failed to update task status");
 
-        // get the payload from the task data
-        let payload_str = task_data
-            .get("payload")
-            .expect("Failed to get payload from task data");
-        // parse the payload as json
-        let mut payload_json: serde_json::Value =
-            serde_json::from_str(payload_str).expect("Failed to parse payload as json");
-
-        let data_key = task_data
-            .get("data_key")
-            .expect("Failed to get data_key from task data");
-
-        // loop while the cursor is not Null
-        loop {
-            let response = client
-                .post(&task_data["url"])
-                .json(&payload_json)
-                .send()
-                .await
-                .expect("Failed to get response from url");
-
-            // if the response is not 200, then update the status to failed and break
-            if !response.status().is_success() {
-                let _: () = con
-                    .hset(&task_key, "status", "failed")
-                    .expect("Failed to update task status");
-
-                break;
-            }
+        // validate the task and page through it, so a problem with this task (as opposed to
+        // with redis) marks it as failed instead of stopping the worker
+        let outcome = run_task(&client, &mut con, &task_key, &task_data).await;
 
-            let response = response
-                .json::<serde_json::Value>()
-                .await
-                .expect("Failed to parse response as json");
+        // write the final status and take the task off the temp queue in one atomic round trip,
+        // so a task is never finished but still looks in flight (or the other way around)
+        let mut finish = redis::pipe();
+        finish.atomic();
 
-            println!("Got response: {:?}", response);
+        match outcome {
+            Ok(()) => {
+                tracing::info!("Finished task: {}", task_key);
+
+                finish.hset(&task_key, "status", "complete").ignore();
+            }
+            Err(error) => {
+                tracing::error!("Task {} failed: {}", task_key, error);
+
+                // keep whatever data was saved before the failure, and record why it stopped
+                finish
+                    .hset_multiple(
+                        &task_key,
+                        &[("status", "failed"), ("error", error.as_str())],
+                    )
+                    .ignore();
+            }
+        }
 
-            let cursor = &response["cursor"];
+        let _: () = finish
+            .lrem(&temp_queue_name, 1, &task_key)
+            .ignore()
+            .query(&mut con)
+            .expect("Failed to finish task");
+    }
+}
 
-            // Iterate using the returned cursor
+/**
+ * Calls the task's url with its payload, following the returned cursor until it is null, and
+ * appends each response's data to the task's data list.
+ *
+ * Returns a description of the problem if the task is malformed or its url can't be processed.
+ */
+async fn run_task(
+    client: &reqwest::Client,
+    con: &mut redis::Connection,
+    task_key: &str,
+    task_data: &HashMap<String, String>,
+) -> Result<(), String> {
+    let url = task_data.get("url").ok_or("task has no url")?;
+
+    // get the payload from the task data and parse it as json
+    let payload_str = task_data.get("payload").ok_or("task has no payload")?;
+    let mut payload_json: serde_json::Value = serde_json::from_str(payload_str)
+        .map_err(|e| format!("failed to parse payload as json: {}", e))?;
+
+    let data_key = task_data.get("data_key").ok_or("task has no data_key")?;
+
+    let task_data_key = format!("{}:data", task_key);
+
+    // loop while the cursor is not Null
+    loop {
+        let response = match client.post(url).json(&payload_json).send().await {
+            Ok(response) => response,
+            Err(e) => return Err(format!("request failed: {}", e)),
+        };
 
-            // Store the data from the data_key into the task data as a json string of an array
-            let data = &response[data_key];
+        if !response.status().is_success() {
+            return Err(format!("request failed with status {}", response.status()));
+        }
 
-            let data_str = serde_json::to_string(&data).expect("Failed to serialize data as json");
+        let response_body = match response.bytes().await {
+            Ok(response_body) => response_body,
+            Err(e) => return Err(format!("failed to read response body: {}", e)),
+        };
 
-            let task_data_key = format!("{}:data", task_key);
+        tracing::trace!("Got response: {}", String::from_utf8_lossy(&response_body));
 
-            let _: () = con
-                .rpush(&task_data_key, data_str)
-                .expect("Failed to save task data");
+        // only split the response into its top level fields, leaving the values as raw json
+        // so the data can be stored without building and re-serializing a Value tree
+        let response: HashMap<String, &RawValue> = match serde_json::from_slice(&response_body) {
+            Ok(response) => response,
+            Err(e) => return Err(format!("failed to parse response as json: {}", e)),
+        };
 
-            if cursor.is_null() {
-                break;
-            }
+        let cursor: serde_json::Value = match response.get("cursor") {
+            Some(cursor) => match serde_json::from_str(cursor.get()) {
+                Ok(cursor) => cursor,
+                Err(e) => return Err(format!("failed to parse cursor as json: {}", e)),
+            },
+            None => serde_json::Value::Null,
+        };
 
-            payload_json["cursor"] = cursor.clone();
-        }
+        // Iterate using the returned cursor
 
-        println!("Finished task: {}", task_key);
+        // Store the data from the data_key into the task data as a json string of an array
+        let data_str = response
+            .get(data_key.as_str())
+            .map_or("null", |data| data.get());
 
-        // update the status to complete
         let _: () = con
-            .hset(&task_key, "status", "complete")
-            .expect("Failed to update task status");
+            .rpush(&task_data_key, data_str)
+            .expect("Failed to save task data");
 
-        let _: () = con
-            .lrem(&temp_queue_name, 1, task_key)
-            .expect("Failed to remove task from temp queue");
+        if cursor.is_null() {
+            return Ok(());
+        }
+
+        payload_json["cursor"] = cursor;
     }
 }
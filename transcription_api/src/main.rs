@@ -15,7 +15,10 @@ struct AppState {
     task_api_url: String,
     task_api_external_url: String,
 
-    this_api_base_url: String,
+    detect_segment_url: String,
+
+    whisper_device: String,
+    model_path: String,
 
     http_client: reqwest::Client,
 }
@@ -31,8 +34,13 @@ async fn main() -> Result<(), axum::BoxError> {
         task_api_external_url: dotenvy::var("TASK_API_EXTERNAL_URL")
             .expect("TASK_API_EXTERNAL_URL must be set"),
 
-        this_api_base_url: dotenvy::var("THIS_API_BASE_URL")
-            .expect("THIS_API_BASE_URL must be set"),
+        detect_segment_url: format!(
+            "{}/detect/segment",
+            dotenvy::var("THIS_API_BASE_URL").expect("THIS_API_BASE_URL must be set")
+        ),
+
+        whisper_device: dotenvy::var("WHISPER_DEVICE").unwrap_or("cuda".to_string()),
+        model_path: dotenvy::var("MODEL_PATH").expect("MODEL_PATH must be set"),
 
         http_client: reqwest::Client::new(),
     };
@@ -58,6 +66,12 @@ struct DetectSegmentInput {
     initial_prompt: Option<String>,
 }
 
+#[derive(Serialize, Debug)]
+struct DetectSegmentOutput {
+    cursor: Option<Cursor>,
+    segments: Vec<Segment>,
+}
+
 /**
  * An individual segment of a transcript with a start and end duration in ISO 8601 format, and
  * the text of the segment.
@@ -71,6 +85,22 @@ struct Segment {
     text: String,
 }
 
+/**
+ * The parts of whisper's JSON output file that we use. Everything else in the file (tokens,
+ * log probabilities, etc.) is skipped while parsing.
+ */
+#[derive(Deserialize, Debug)]
+struct WhisperOutput {
+    segments: Vec<WhisperSegment>,
+}
+
+#[derive(Deserialize, Debug)]
+struct WhisperSegment {
+    start: f64,
+    end: f64,
+    text: String,
+}
+
 #[instrument]
 async fn detect_segment(
     State(state): State<AppState>,
@@ -91,6 +121,21 @@ async fn detect_segment(
         None => Cursor { index: 0 },
     };
 
+    // if no uris are provided, there is nothing to transcribe, so return an empty list of
+    // segments without spawning ffmpeg and whisper
+    if body.uris.is_empty() {
+        return axum::Json(DetectSegmentOutput {
+            cursor: None,
+            segments: vec![],
+        })
+        .into_response();
+    }
+
+    // if cursor is out of bounds, return an error
+    if cursor.index >= body.uris.len() {
+        return (StatusCode::BAD_REQUEST, "invalid cursor").into_response();
+    }
+
     let uri = &body.uris[cursor.index];
 
     // extract filename from uri
@@ -120,36 +165,18 @@ async fn detect_segment(
         .spawn()
     {
         Ok(process) => process,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     let audio: Stdio = match audio_extraction.stdout.take().unwrap().try_into() {
         Ok(audio) => audio,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     // make a temp dir for the transcription
     let temp_dir = match tempfile::tempdir() {
         Ok(temp_dir) => temp_dir,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     let mut whisper_detection = match Command::new("whisper")
@@ -158,7 +185,7 @@ async fn detect_segment(
         .arg("--initial_prompt")
         .arg(initial_prompt)
         .arg("--model_dir")
-        .arg("/model/")
+        .arg(&state.model_path)
         .arg("--output_format")
         .arg("json")
         .arg("--output_dir")
@@ -166,7 +193,14 @@ async fn detect_segment(
         .arg("--task")
         .arg("transcribe")
         .arg("--device")
-        .arg("cuda")
+        .arg(&state.whisper_device)
+        // half precision is only supported on the GPU, so skip the fp16 attempt on the CPU
+        .arg("--fp16")
+        .arg(if state.whisper_device == "cpu" {
+            "False"
+        } else {
+            "True"
+        })
         .arg("--language")
         .arg(language)
         .arg("-")
@@ -174,112 +208,69 @@ async fn detect_segment(
         .spawn()
     {
         Ok(process) => process,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     let whisper_status = match whisper_detection.wait().await {
         Ok(status) => status,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     if !whisper_status.success() {
-        return (
-            StatusCode::INTERNAL_SERVER_ERROR,
-            axum::Json(json!({ "error": "whisper failed" })),
-        )
-            .into_response();
+        return internal_error("whisper failed");
     }
 
     let transcription_path = temp_dir.path().join("-.json");
 
     // read the file and parse the json
-    let transcription_json = match std::fs::read_to_string(transcription_path) {
+    let transcription_json = match tokio::fs::read(transcription_path).await {
         Ok(transcription) => transcription,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     // use a struct to parse the json
-    let transcription = match serde_json::from_str::<serde_json::Value>(&transcription_json) {
+    let transcription = match serde_json::from_slice::<WhisperOutput>(&transcription_json) {
         Ok(transcription) => transcription,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
-    };
-
-    let segments = match transcription["segments"].as_array() {
-        Some(segments) => segments,
-        None => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": "invalid json" })),
-            )
-                .into_response();
-        }
+        Err(e) => return internal_error(e),
     };
 
     // convert the segments to a vector of Segment structs
-    let segments = segments
-        .iter()
-        .map(|segment| {
-            let start = match segment["start"].as_f64() {
-                Some(start) => std::time::Duration::from_micros((start * 1_000_000.0) as u64),
-                None => return None,
-            };
-
-            let end = match segment["end"].as_f64() {
-                Some(end) => std::time::Duration::from_micros((end * 1_000_000.0) as u64),
-                None => return None,
-            };
-
-            let text = match segment["text"].as_str() {
-                Some(text) => text,
-                None => return None,
-            };
-
-            Some(Segment {
-                start,
-                end,
-                text: text.to_string(),
-            })
+    let segments = transcription
+        .segments
+        .into_iter()
+        .map(|segment| Segment {
+            start: std::time::Duration::from_micros((segment.start * 1_000_000.0) as u64),
+            end: std::time::Duration::from_micros((segment.end * 1_000_000.0) as u64),
+            text: segment.text,
         })
-        .filter_map(|segment| segment)
         .collect::<Vec<Segment>>();
 
     // if this was the last item in the list, then return None for the cursor
     // return the segments
-    axum::Json(json!(   {
-        "segments": segments,
-        "cursor": if cursor.index + 1 >= body.uris.len() {
+    axum::Json(DetectSegmentOutput {
+        segments,
+        cursor: if cursor.index + 1 >= body.uris.len() {
             None
         } else {
-            Some(Cursor { index: cursor.index + 1 })
+            Some(Cursor {
+                index: cursor.index + 1,
+            })
         },
-    }))
+    })
     .into_response()
 }
 
+/**
+ * Builds the 500 response for internal failures, with the error message in a JSON body.
+ */
+fn internal_error(error: impl ToString) -> axum::response::Response {
+    (
+        StatusCode::INTERNAL_SERVER_ERROR,
+        axum::Json(json!({ "error": error.to_string() })),
+    )
+        .into_response()
+}
+
 #[derive(Deserialize, Debug)]
 struct DetectInput {
     uris: Vec<String>,
@@ -288,6 +279,24 @@ struct DetectInput {
     initial_prompt: Option<String>,
 }
 
+/**
+ * The task API request that runs detect_segment over every uri in the background.
+ */
+#[derive(Serialize, Debug)]
+struct CreateTaskRequest<'a> {
+    url: &'a str,
+    payload: DetectSegmentPayload<'a>,
+    data_key: &'a str,
+}
+
+#[derive(Serialize, Debug)]
+struct DetectSegmentPayload<'a> {
+    uris: &'a [String],
+    track: u8,
+    language: &'a str,
+    initial_prompt: &'a str,
+}
+
 #[derive(Deserialize, Debug)]
 struct Task {
     id: String,
@@ -298,6 +307,15 @@ async fn detect(State(state): State<AppState>, Json(body): Json<DetectInput>) ->
     // call task api to find the segments in the background asynchrnously,
     // and return a 202 Accepted response with the URL of the task
 
+    // nothing to transcribe, so don't queue a task for it
+    if body.uris.is_empty() {
+        return (
+            StatusCode::BAD_REQUEST,
+            axum::Json(json!({ "error": "uris must not be empty" })),
+        )
+            .into_response();
+    }
+
     let language = match body.language {
         Some(language) => language,
         None => "en".to_string(),
@@ -308,58 +326,37 @@ async fn detect(State(state): State<AppState>, Json(body): Json<DetectInput>) ->
         None => "".to_string(),
     };
 
-    let uris = body.uris.clone();
-
-    let track = body.track;
-
-    let http_client = state.http_client.clone();
-
-    let response = match http_client
+    let response = match state
+        .http_client
         .post(&state.task_api_url)
-        .json(&json!({
-            "url": format!("{}/detect/segment", state.this_api_base_url),
-            "payload": json!({
-                "uris": uris,
-                "track": track,
-                "language": language,
-                "initial_prompt": initial_prompt,
-            }),
-            "data_key": "segments",
-        }))
+        .json(&CreateTaskRequest {
+            url: &state.detect_segment_url,
+            payload: DetectSegmentPayload {
+                uris: &body.uris,
+                track: body.track,
+                language: &language,
+                initial_prompt: &initial_prompt,
+            },
+            data_key: "segments",
+        })
         .send()
         .await
     {
         Ok(response) => response,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     debug!("task api response: {:?}", response);
 
     // if the task api returns an error, then return an error
     if !response.status().is_success() {
-        return (
-            StatusCode::INTERNAL_SERVER_ERROR,
-            axum::Json(json!({ "error": "task api error" })),
-        )
-            .into_response();
+        return internal_error("task api error");
     }
 
     // log the body of the response
     let response_body = match response.json::<Task>().await {
         Ok(response_body) => response_body,
-        Err(e) => {
-            return (
-                StatusCode::INTERNAL_SERVER_ERROR,
-                axum::Json(json!({ "error": e.to_string() })),
-            )
-                .into_response()
-        }
+        Err(e) => return internal_error(e),
     };
 
     (